@@ -0,0 +1,47 @@
+"""Rebuild opening_book.pkl from the hard AI's own search.
+
+Run from this folder with `python build_opening_book.py`. The book only
+caches what depth-6 search already plays, so rebuild it whenever the search
+or the evaluation changes. game.py ignores a book whose stamp no longer
+matches; the stamp covers the hashing and weight tables on its own, but a
+change to the search or evaluation code must also bump BOOK_FORMAT_VERSION.
+"""
+import math
+import pickle
+import random
+
+import game
+
+
+def build_opening_book():
+    game.OPENING_BOOK = {}  # search every position instead of reading the old book
+    ai = game.AI(depth=game.BOOK_DEPTH, time_budget=math.inf)
+    random.seed(0)
+    book = {}
+    # Walk every position the human-first GUI can reach, one ply at a time,
+    # keeping a single board per mirror-image pair
+    positions = [game.Board()]
+    for plies in range(game.BOOK_PLIES + 1):
+        next_positions = {}
+        for board in positions:
+            if board.current_player == game.Board.AI:
+                ai.set_board(board)
+                col = ai.get_move()
+                if board.mirror_hash < board.hash:
+                    col = game.COLS - 1 - col
+                book[board.canonical_hash()] = col
+            if plies < game.BOOK_PLIES:
+                for col in board.get_valid_moves():
+                    child = board.clone()
+                    child.drop_piece(col)
+                    if not child.game_over:
+                        next_positions.setdefault(child.canonical_hash(), child)
+        positions = list(next_positions.values())
+    return book
+
+
+if __name__ == "__main__":
+    book = build_opening_book()
+    with open(game.BOOK_PATH, "wb") as f:
+        pickle.dump({"stamp": game.opening_book_stamp(), "moves": book}, f)
+    print(f"Wrote {len(book)} positions to {game.BOOK_PATH}")
@@ -3,19 +3,167 @@ from tkinter import ttk
 from tkinter import messagebox
 import random
 import math
+import time
+from array import array
 from PIL import Image, ImageTk, ImageDraw
 import os
+import pickle
+import threading
+import traceback
+import hashlib
+
+ROWS = 6
+COLS = 7
+H1 = ROWS + 1  # bits per column in a bitboard: ROWS cells plus one sentinel bit
+
+# Lowest bit of each column; a piece at height h in column c is COL_BIT[c] << h
+COL_BIT = tuple(1 << (col * H1) for col in range(COLS))
+
+# Zobrist keys: one random 64-bit number per (player, column, height). A
+# position's hash is the XOR of the keys of its pieces, so a move updates it
+# with one XOR. The generator is seeded so hashes are the same on every run:
+# the opening book is keyed by them.
+ZOBRIST_RNG = random.Random(1988)
+ZOBRIST = [[[ZOBRIST_RNG.getrandbits(64) for _ in range(ROWS)] for _ in range(COLS)] for _ in range(3)]
+
+# Transposition table entry flags and size (a power of two). The table is a
+# flat array of two 64-bit words per entry: the position's hash, then
+# (value + TT_VALUE_OFFSET) << 16 | depth << 8 | flag << 4 | best column.
+EXACT, LOWER, UPPER = 0, 1, 2
+TT_SIZE = 1 << 20  # 16 MB
+TT_MASK = TT_SIZE - 1
+TT_VALUE_OFFSET = 1 << 31
+
+# Columns from the center outwards: central moves are usually strongest,
+# so trying them first lets alpha-beta cut off more of the tree
+MOVE_ORDER = tuple(sorted(range(COLS), key=lambda c: abs(c - COLS // 2)))
+
+
+def build_lines():
+    """Bitmasks of every run of four cells: horizontal, vertical and both diagonals"""
+    lines = []
+    for col in range(COLS):
+        for height in range(ROWS):
+            for dc, dh in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                if 0 <= col + 3*dc < COLS and 0 <= height + 3*dh < ROWS:
+                    mask = 0
+                    for i in range(4):
+                        mask |= 1 << ((col + i*dc) * H1 + height + i*dh)
+                    lines.append(mask)
+    return tuple(lines)
+
+
+LINES = build_lines()  # 69 lines on a 6x7 board
+CENTER_MASK = ((1 << ROWS) - 1) << (COLS // 2 * H1)
+
+
+def build_line_evaluator():
+    """Compile evaluate_lines(bb_ai, bb_human, scores) with the loop over LINES unrolled"""
+    # Each mask becomes a literal constant in straight-line code, so scoring a
+    # leaf runs no loop and loads no masks. A line scores for whichever side
+    # owns all of its pieces. Testing the combined occupancy first drops an
+    # empty line after one AND, and a line with any human piece is live for the
+    # human only if those are all its pieces; anything else is dead.
+    source = [
+        "def evaluate_lines(bb_ai, bb_human, scores):",
+        "    score = 0",
+        "    occupied = bb_ai | bb_human",
+    ]
+    for m in LINES:
+        source += [
+            f"    if o := occupied & {m}:",
+            f"        if not (h := o & bb_human):",
+            f"            score += scores[o.bit_count()]",
+            f"        elif h == o:",
+            f"            score -= scores[h.bit_count()]",
+        ]
+    source.append("    return score")
+    namespace = {}
+    exec("\n".join(source), namespace)
+    return namespace["evaluate_lines"]
+
+
+evaluate_lines = build_line_evaluator()
+
+# Integer weights so scores pack into the transposition table
+DIFFICULTY_WEIGHTS = {
+    "easy": {'win': 10, 'block': 5, 'center': 3},
+    "medium": {'win': 30, 'block': 20, 'center': 10},
+    "hard": {'win': 50, 'block': 40, 'center': 20}
+}
+# Score of an open line by the number of pieces on it
+LINE_SCORES = {
+    difficulty: tuple(weights['win'] * n**2 for n in range(5))
+    for difficulty, weights in DIFFICULTY_WEIGHTS.items()
+}
+
+# Opening book: canonical hash -> best column, as seen from the canonical
+# orientation, for every position the AI can face with at most BOOK_PLIES
+# pieces down. Built offline by build_opening_book.py from hard's own search.
+BOOK_PLIES = 6
+BOOK_DEPTH = 6  # the hard AI's search depth
+# Bump whenever the search or the evaluation code changes (a_star_search,
+# get_move, the generated line evaluator, has_won): the stamp below cannot
+# see code, so this is what retires a book built by the old code
+BOOK_FORMAT_VERSION = 1
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.pkl")
+
+
+def opening_book_stamp():
+    # Digest of the tables the stored moves depend on plus BOOK_FORMAT_VERSION,
+    # which stands in for the code. A book saved under a different stamp was
+    # built for other hashes, weights or search code.
+    inputs = (BOOK_FORMAT_VERSION, ZOBRIST, LINES, MOVE_ORDER, DIFFICULTY_WEIGHTS, LINE_SCORES,
+              BOOK_PLIES, BOOK_DEPTH)
+    return hashlib.sha256(repr(inputs).encode()).hexdigest()
+
+
+def load_opening_book():
+    try:
+        with open(BOOK_PATH, "rb") as f:
+            data = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        # Without a book the search still finds the moves, just more slowly
+        return {}
+    if not isinstance(data, dict) or data.get("stamp") != opening_book_stamp():
+        return {}  # stale: rebuild it with build_opening_book.py
+    return data["moves"]
+
+
+OPENING_BOOK = load_opening_book()
+
+
+def has_won(bb):
+    """True if the bitboard holds four in a row in any direction"""
+    # Pairs one step apart, then pairs of pairs two steps apart: vertical,
+    # horizontal and both diagonals. The empty sentinel bit on top of each
+    # column stops runs from wrapping between columns.
+    v = bb & (bb >> 1)
+    h = bb & (bb >> H1)
+    d1 = bb & (bb >> (H1 - 1))
+    d2 = bb & (bb >> (H1 + 1))
+    return (v & (v >> 2)) | (h & (h >> 2*H1)) | (d1 & (d1 >> 2*(H1 - 1))) | (d2 & (d2 >> 2*(H1 + 1))) != 0
+
 
 class Board:
     EMPTY = 0
     HUMAN = 1
     AI = 2
 
-    def __init__(self, rows=6, cols=7):
-        
-        self.rows = rows
-        self.cols = cols
-        self.board = [[self.EMPTY] * cols for _ in range(rows)]
+    # Pieces are stored as two bitboards, one per player. Column c occupies
+    # bits c*H1 .. c*H1+ROWS-1 (bottom cell first); the extra bit on top of
+    # each column stays empty so shifted lines never wrap into the next column.
+    def __init__(self):
+        # The size is fixed by the bitboard layout; kept for the GUI to read
+        self.rows = ROWS
+        self.cols = COLS
+        self.bb_human = 0
+        self.bb_ai = 0
+        self.heights = [0] * COLS
+        self.move_count = 0
+        self.moves = []
+        self.hash = 0
+        self.mirror_hash = 0  # hash of the position reflected left to right
         self.current_player = self.HUMAN
         self.winner = None
         self.game_over = False
@@ -23,47 +171,94 @@ class Board:
         self.winning_positions = []
 
     def reset(self):
-        self.board = [[self.EMPTY] * self.cols for _ in range(self.rows)]
+        self.bb_human = 0
+        self.bb_ai = 0
+        self.heights = [0] * COLS
+        self.move_count = 0
+        self.moves = []
+        self.hash = 0
+        self.mirror_hash = 0
         self.current_player = self.HUMAN
         self.winner = None
         self.game_over = False
         self.last_move = None
         self.winning_positions = []
 
+    def get_cell(self, row, col):
+        bit = COL_BIT[col] << (ROWS - 1 - row)
+        if self.bb_human & bit:
+            return self.HUMAN
+        if self.bb_ai & bit:
+            return self.AI
+        return self.EMPTY
+
     def is_valid_move(self, col):
-        return 0 <= col < self.cols and self.board[0][col] == self.EMPTY
+        return 0 <= col < COLS and self.heights[col] < ROWS
 
     def get_valid_moves(self):
-        return [col for col in range(self.cols) if self.is_valid_move(col)]
+        return [col for col in range(COLS) if self.heights[col] < ROWS]
 
     def drop_piece(self, col):
         if not self.is_valid_move(col) or self.game_over:
             return False
-        row = -1
-        for r in range(self.rows-1, -1, -1):
-            if self.board[r][col] == self.EMPTY:
-                self.board[r][col] = self.current_player
-                row = r
-                self.last_move = (row, col)
-                break
-        if self.check_win(row, col):
-            self.winner = self.current_player
+        player = self.current_player
+        row = ROWS - 1 - self.heights[col]
+        self.play(col)
+        self.last_move = (row, col)
+        if has_won(self.bb_human if player == self.HUMAN else self.bb_ai):
+            self.winning_positions = self.find_winning_positions(row, col)
+            self.winner = player
             self.game_over = True
+            self.current_player = player
         elif self.is_full():
             self.game_over = True
-        else:
-            self.current_player = self.AI if self.current_player == self.HUMAN else self.HUMAN
+            self.current_player = player
         return True
 
+    def play(self, col):
+        """Search-only move: no validity or game-over bookkeeping, undone by undo()"""
+        height = self.heights[col]
+        bit = COL_BIT[col] << height
+        keys = ZOBRIST[self.current_player]
+        self.hash ^= keys[col][height]
+        self.mirror_hash ^= keys[COLS - 1 - col][height]
+        if self.current_player == self.HUMAN:
+            self.bb_human |= bit
+            self.current_player = self.AI
+        else:
+            self.bb_ai |= bit
+            self.current_player = self.HUMAN
+        self.heights[col] = height + 1
+        self.move_count += 1
+        self.moves.append(col)
+
+    def undo(self):
+        col = self.moves.pop()
+        height = self.heights[col] - 1
+        bit = COL_BIT[col] << height
+        if self.current_player == self.HUMAN:
+            self.bb_ai ^= bit
+            self.current_player = self.AI
+        else:
+            self.bb_human ^= bit
+            self.current_player = self.HUMAN
+        keys = ZOBRIST[self.current_player]
+        self.hash ^= keys[col][height]
+        self.mirror_hash ^= keys[COLS - 1 - col][height]
+        self.heights[col] = height
+        self.move_count -= 1
+
     def is_full(self):
-        return all(cell != self.EMPTY for cell in self.board[0])
+        return self.move_count == ROWS * COLS
 
-    def check_win(self, row, col):
-        if row < 0 or col < 0:
-            return False
-        player = self.board[row][col]
-        if player == self.EMPTY:
-            return False
+    def canonical_hash(self):
+        # A position and its mirror image play out identically, so both map to
+        # the smaller of their two hashes
+        return min(self.hash, self.mirror_hash)
+
+    def find_winning_positions(self, row, col):
+        # Only run once a win is known, to collect the cells for the GUI
+        player = self.get_cell(row, col)
         directions = [
             [(0, 1), (0, -1)],
             [(1, 0), (-1, 0)],
@@ -71,22 +266,19 @@ class Board:
             [(1, -1), (-1, 1)]
         ]
         for dir_pair in directions:
-            count = 1
             positions = [(row, col)]
             for dr, dc in dir_pair:
                 r, c = row, col
                 for _ in range(3):
                     r += dr
                     c += dc
-                    if 0 <= r < self.rows and 0 <= c < self.cols and self.board[r][c] == player:
-                        count += 1
+                    if 0 <= r < ROWS and 0 <= c < COLS and self.get_cell(r, c) == player:
                         positions.append((r, c))
                     else:
                         break
-            if count >= 4:
-                self.winning_positions = positions
-                return True
-        return False
+            if len(positions) >= 4:
+                return positions
+        return []
 
     def get_winner(self):
         return self.winner if self.game_over else None
@@ -98,8 +290,14 @@ class Board:
         return self.winning_positions
 
     def clone(self):
-        new_board = Board(self.rows, self.cols)
-        new_board.board = [row[:] for row in self.board]
+        new_board = Board()
+        new_board.bb_human = self.bb_human
+        new_board.bb_ai = self.bb_ai
+        new_board.heights = self.heights[:]
+        new_board.move_count = self.move_count
+        new_board.moves = self.moves[:]
+        new_board.hash = self.hash
+        new_board.mirror_hash = self.mirror_hash
         new_board.current_player = self.current_player
         new_board.winner = self.winner
         new_board.game_over = self.game_over
@@ -107,202 +305,44 @@ class Board:
         return new_board
 
 class AI:
-    def __init__(self, depth=4):
+    def __init__(self, depth=4, time_budget=2.0):
         self.depth = depth
+        self.time_budget = time_budget  # seconds per move before deepening stops
         self.board = None
+        self.tt = array('Q', [0]) * (2 * TT_SIZE)
+        # depth is fixed for an AI's lifetime, so its leaf weights are too
+        self.difficulty = self.get_difficulty_level()
+        self.leaf_scores = LINE_SCORES[self.difficulty]
+        self.center_weight = DIFFICULTY_WEIGHTS[self.difficulty]['center']
 
     def set_board(self, board):
         self.board = board
 
-    def get_move(self):
-        valid_moves = self.board.get_valid_moves()
-        if not valid_moves:
-            return None
-
-        # Difficulty: easy = more random, medium = some random, hard = always best
-        difficulty = self.get_difficulty_level()
-        if difficulty == "easy" and random.random() < 0.7:
-            return random.choice(valid_moves)
-        elif difficulty == "medium" and random.random() < 0.3:
-            return random.choice(valid_moves)
-
-        # Check for immediate win
-        for col in valid_moves:
-            temp_board = self.board.clone()
-            temp_board.drop_piece(col)
-            if temp_board.winner == Board.AI:
-                return col
-
-        # Block human's immediate win
-        for col in valid_moves:
-            temp_board = self.board.clone()
-            temp_board.current_player = Board.HUMAN
-            temp_board.drop_piece(col)
-            if temp_board.winner == Board.HUMAN:
-                return col
-
-        # Use A*-inspired minimax for deeper analysis
-        best_score = -math.inf
-        best_move = random.choice(valid_moves)
-        for col in valid_moves:
-            temp_board = self.board.clone()
-            temp_board.drop_piece(col)
-            score = self.alpha_beta_minmax(temp_board, self.depth-1, False, -math.inf, math.inf)
-            if score > best_score:
-                best_score = score
-                best_move = col
-        return best_move
-
-    def alpha_beta_minmax(self, board, depth, maximizing, alpha, beta): # Min max with alpha beta pruning 
-        # Terminal state 
-        if board.game_over:
-            if board.winner == Board.AI:
-                return 10000
-            elif board.winner == Board.HUMAN:
-                return -10000
-            else:
-                return 0
-        if depth == 0:
-            return self.astar_evaluate_board(board)
-
-        valid_moves = board.get_valid_moves()
-        if maximizing:
-            max_eval = -math.inf
-            for col in valid_moves:
-                temp_board = board.clone()
-                temp_board.current_player = Board.AI
-                temp_board.drop_piece(col)
-                eval = self.alpha_beta_minmax(temp_board, depth-1, False, alpha, beta)
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return max_eval
-        else:
-            min_eval = math.inf
-            for col in valid_moves:
-                temp_board = board.clone()
-                temp_board.current_player = Board.HUMAN
-                temp_board.drop_piece(col)
-                eval = self.alpha_beta_minmax(temp_board, depth-1, True, alpha, beta)
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return min_eval
-
-    def astar_evaluate_board(self, board):
-        # A*-inspired heuristic: count possible lines, center control, block/threats
-        score = 0
-        center_col = board.cols // 2
-        # Center column preference
-        for r in range(board.rows):
-            if board.board[r][center_col] == Board.AI:
-                score += 3
-            elif board.board[r][center_col] == Board.HUMAN:
-                score -= 3
-
-        # Check all 4-in-a-row windows
-        for row in range(board.rows):
-            for col in range(board.cols):
-                if board.board[row][col] != Board.EMPTY:
-                    score += self.evaluate_window(board, row, col, Board.AI)
-                    score -= self.evaluate_window(board, row, col, Board.HUMAN)
-        return score
-
-    def evaluate_window(self, board, row, col, player):
-        # Check all directions for possible 4-in-a-row from (row, col)
-        score = 0
-        directions = [(0,1), (1,0), (1,1), (1,-1)]
-        for dr, dc in directions:
-            count = 0
-            empty = 0
-            for i in range(4):
-                r = row + dr*i
-                c = col + dc*i
-                if 0 <= r < board.rows and 0 <= c < board.cols:
-                    if board.board[r][c] == player:
-                        count += 1
-                    elif board.board[r][c] == Board.EMPTY:
-                        empty += 1
-            # Heuristic: 4 in a row = big score, 3+empty = medium, 2+empty = small
-            if count == 4:
-                score += 100
-            elif count == 3 and empty == 1:
-                score += 10
-            elif count == 2 and empty == 2:
-                score += 2
-        return score
-
-    def get_difficulty_level(self):
-        if self.depth <= 2:
-            return "easy"
-        elif self.depth <= 4:
-            return "medium"
-        else:
-            return "hard"
+    def book_move(self, board):
+        col = OPENING_BOOK.get(board.canonical_hash())
+        if col is not None and board.mirror_hash < board.hash:
+            col = COLS - 1 - col
+        return col
 
-    def __init__(self, depth=4):
-        self.depth = depth
-        self.board = None
-        self.difficulty_weights = {
-            "easy": {'win': 1, 'block': 0.5, 'center': 0.3},
-            "medium": {'win': 3, 'block': 2, 'center': 1},
-            "hard": {'win': 5, 'block': 4, 'center': 2}
-        }
-
-    def set_board(self, board):
-        self.board = board
-
-    def a_star_heuristic(self, board, difficulty):
+    def a_star_heuristic(self, board):
         """A*-inspired heuristic evaluation with difficulty-based weights"""
-        weights = self.difficulty_weights[difficulty]
-        score = 0
+        bb_ai, bb_human = board.bb_ai, board.bb_human
         
-        # Check all possible lines
-        for row in range(board.rows):
-            for col in range(board.cols):
-                if board.board[row][col] == Board.AI:
-                    score += self.evaluate_position(board, row, col, Board.AI, weights)
-                elif board.board[row][col] == Board.HUMAN:
-                    score -= self.evaluate_position(board, row, col, Board.HUMAN, weights)
+        # Check all possible lines: only those not blocked by the opponent count
+        score = evaluate_lines(bb_ai, bb_human, self.leaf_scores)
         
         # Center column preference
-        center_col = board.cols // 2
-        for r in range(board.rows):
-            if board.board[r][center_col] == Board.AI:
-                score += weights['center']
-            elif board.board[r][center_col] == Board.HUMAN:
-                score -= weights['center']
+        score += self.center_weight * ((bb_ai & CENTER_MASK).bit_count() - (bb_human & CENTER_MASK).bit_count())
         
         return score
 
-    def evaluate_position(self, board, row, col, player, weights):
-        """A* style path evaluation for potential lines"""
-        value = 0
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-        
-        for dr, dc in directions:
-            path_length = 0
-            empty_spaces = 0
-            for i in range(4):
-                r = row + dr * i
-                c = col + dc * i
-                if 0 <= r < board.rows and 0 <= c < board.cols:
-                    if board.board[r][c] == player:
-                        path_length += 1
-                    elif board.board[r][c] == Board.EMPTY:
-                        empty_spaces += 1
-                    else:
-                        break
-            if path_length + empty_spaces >= 4:
-                value += weights['win'] * path_length**2
-                
-        return value
-
-    def get_move(self):
-        valid_moves = self.board.get_valid_moves()
-        difficulty = self.get_difficulty_level()
+    def get_move(self, board=None):
+        # Callers on another thread pass a snapshot so the search never reads
+        # a board the GUI may be changing
+        if board is None:
+            board = self.board
+        valid_moves = board.get_valid_moves()
+        difficulty = self.difficulty
         
         if not valid_moves:
             return None
@@ -311,48 +351,123 @@ class AI:
         if difficulty == "easy":
             if random.random() < 0.5:
                 return random.choice(valid_moves)
+
+        # The book holds depth-BOOK_DEPTH choices, so only an AI searching that
+        # deep skips the search with it
+        if self.depth == BOOK_DEPTH and board.move_count <= BOOK_PLIES:
+            col = self.book_move(board)
+            if col is not None and board.is_valid_move(col):
+                return col
             
-        best_score = -math.inf
         best_move = random.choice(valid_moves)
+        board = board.clone()
+        deadline = time.monotonic() + self.time_budget
         
-        for col in valid_moves:
-            temp_board = self.board.clone()
-            temp_board.drop_piece(col)
-            score = self.a_star_search(temp_board, self.depth-1, False)
-            if score > best_score:
-                best_score = score
-                best_move = col
+        # Iterative deepening: each pass leaves best moves in the transposition
+        # table that order the next, deeper pass, and the previous pass's choice
+        # is tried first at the root. A pass cut short by the time budget is
+        # dropped in favour of the last complete one.
+        for depth in range(1, self.depth + 1):
+            root_moves = [best_move] + [col for col in valid_moves if col != best_move]
+            best_score = -math.inf
+            pass_best = best_move
+            # The best score so far is the root's alpha: a later move only needs
+            # to be searched far enough to show it can't beat it
+            for col in root_moves:
+                if depth > 1 and time.monotonic() > deadline:
+                    return best_move
+                board.play(col)
+                score = self.a_star_search(board, depth-1, False, best_score, math.inf)
+                board.undo()
+                if score > best_score:
+                    best_score = score
+                    pass_best = col
+            best_move = pass_best
                 
         return best_move
 
-    def a_star_search(self, board, depth, maximizing):
+    def a_star_search(self, board, depth, maximizing, alpha, beta):
         """A*-inspired search with alpha-beta pruning"""
-        if board.game_over or depth == 0:
-            return self.a_star_heuristic(board, self.get_difficulty_level())
-        
-        valid_moves = board.get_valid_moves()
+        last_mover = board.bb_human if maximizing else board.bb_ai
+        if depth == 0 or has_won(last_mover) or board.is_full():
+            return self.a_star_heuristic(board)
+
+        # Transposition table probe: reuse a result searched at least as deep,
+        # as long as its bound type settles this (alpha, beta) window. Mirror
+        # images share one entry under the smaller hash, with the best move
+        # stored as seen from that side.
+        tt = self.tt
+        key, mirror_key = board.hash, board.mirror_hash
+        mirrored = mirror_key < key
+        if mirrored:
+            key = mirror_key
+        index = (key & TT_MASK) << 1
+        data = tt[index + 1]
+        hash_move = None
+        if data and tt[index] == key:
+            if (data >> 8) & 0xFF >= depth:
+                value, flag = (data >> 16) - TT_VALUE_OFFSET, (data >> 4) & 0xF
+                if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                    return value
+            hash_move = data & 0xF
+            if mirrored:
+                hash_move = COLS - 1 - hash_move
+        alpha_orig, beta_orig = alpha, beta
+
+        # Best move from an earlier search of this position first, then center-out
+        heights = board.heights
+        valid_moves = [col for col in MOVE_ORDER if heights[col] < ROWS and col != hash_move]
+        if hash_move is not None:
+            valid_moves.insert(0, hash_move)
+
+        # Hot loop: bound methods in locals, plain comparisons instead of max()/min()
+        play, undo, search = board.play, board.undo, self.a_star_search
         if maximizing:
-            max_eval = -math.inf
+            value = -math.inf
             for col in valid_moves:
-                temp_board = board.clone()
-                temp_board.drop_piece(col)
-                eval = self.a_star_search(temp_board, depth-1, False)
-                max_eval = max(max_eval, eval)
-            return max_eval
+                play(col)
+                eval = search(board, depth-1, False, alpha, beta)
+                undo()
+                if eval > value:
+                    value = eval
+                    best_move = col
+                    if eval > alpha:
+                        alpha = eval
+                if beta <= alpha:
+                    break
         else:
-            min_eval = math.inf
+            value = math.inf
             for col in valid_moves:
-                temp_board = board.clone()
-                temp_board.drop_piece(col)
-                eval = self.a_star_search(temp_board, depth-1, True)
-                min_eval = min(min_eval, eval)
-            return min_eval
+                play(col)
+                eval = search(board, depth-1, True, alpha, beta)
+                undo()
+                if eval < value:
+                    value = eval
+                    best_move = col
+                    if eval < beta:
+                        beta = eval
+                if beta <= alpha:
+                    break
+
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        # Depth-preferred replacement: keep whichever entry was searched deeper
+        if (tt[index + 1] >> 8) & 0xFF <= depth:
+            if mirrored:
+                best_move = COLS - 1 - best_move
+            tt[index] = key
+            tt[index + 1] = (value + TT_VALUE_OFFSET) << 16 | depth << 8 | flag << 4 | best_move
+        return value
 
     def get_difficulty_level(self):
         return {
             2: "easy",
             4: "medium",
-            6: "hard"
+            BOOK_DEPTH: "hard"
         }.get(self.depth, "medium")
 
 class Game:
@@ -439,7 +554,18 @@ class GameGUI(tk.Tk):
         self.style.configure('TFrame', background='#0B0B2B')
 
         self.game = Game(ai_depth=ai_depth)
+        self.round_id = 0  # bumped on every reset so late AI results are dropped
+        self.ai_busy = False  # a worker is searching; only one runs at a time
+        self.ai_queued = False  # the current round wants a search once it's free
         self.cell_size = 90
+        self.border_size = 10
+        # Cell centers and piece radius never change, so work them out once
+        self.piece_radius = min(self.game.board.cols * self.cell_size // (2 * self.game.board.cols),
+                                self.game.board.rows * self.cell_size // (2 * self.game.board.rows)) - 4
+        self.centers = [[(col * self.cell_size + self.cell_size//2 + self.border_size,
+                          row * self.cell_size + self.cell_size//2 + self.border_size)
+                         for col in range(self.game.board.cols)]
+                        for row in range(self.game.board.rows)]
         self.colors = {
             0: "#0B0B2B",      # Empty cell: deep space blue
             1: "#4A90E2",      # Human: bright blue
@@ -502,7 +628,7 @@ class GameGUI(tk.Tk):
                                height=self.game.board.rows * self.cell_size + 2*border_size,
                                bg="#0B0B2B", highlightthickness=0)
         self.canvas.pack(pady=10)
-        self.canvas.create_image(0, 0, anchor="nw", image=self.bg_image)
+        self.canvas.create_image(0, 0, anchor="nw", image=self.bg_image, tags="bg")
         self.canvas.bind("<Button-1>", self.on_click)
 
         score_frame = ttk.Frame(main_frame, style='TFrame')
@@ -535,60 +661,101 @@ class GameGUI(tk.Tk):
         self.status.pack(pady=10)
 
     def draw_board(self):
-        self.canvas.delete("all")
-        if hasattr(self, 'bg_image'):
-            self.canvas.create_image(0, 0, anchor="nw", image=self.bg_image)
+        # The background image stays on the canvas; only the cells are redrawn
+        self.canvas.delete("cell")
         winning_positions = set(self.game.get_winning_positions()) if self.game.is_game_over() else set()
-        
-        # Calculate cell size to fit within the background
-        border_size = 10
-        available_width = self.game.board.cols * self.cell_size
-        available_height = self.game.board.rows * self.cell_size
-        piece_radius = min(available_width // (2 * self.game.board.cols), 
-                          available_height // (2 * self.game.board.rows)) - 4
-        
         for row in range(self.game.board.rows):
             for col in range(self.game.board.cols):
-                x = col * self.cell_size + self.cell_size//2 + border_size
-                y = row * self.cell_size + self.cell_size//2 + border_size
-                
-                # Outer ring for depth
-                self.canvas.create_oval(x-piece_radius-2, y-piece_radius-2,
-                                      x+piece_radius+2, y+piece_radius+2,
-                                      fill="#1A1A3A", outline="#F5F5F5")
-                
-                value = self.game.board.board[row][col]
-                if value != Board.EMPTY:
-                    color = self.colors[value]
-                    if (row, col) in winning_positions:
-                        self.canvas.create_oval(x-piece_radius-4, y-piece_radius-4,
-                                              x+piece_radius+4, y+piece_radius+4,
-                                              fill=self.colors["highlight"],
-                                              outline="")
-                    self.canvas.create_oval(x-piece_radius, y-piece_radius,
-                                          x+piece_radius, y+piece_radius,
-                                          fill=color, outline="#F5F5F5", width=2)
-                else:
-                    # Empty cell
-                    self.canvas.create_oval(x-piece_radius, y-piece_radius,
-                                           x+piece_radius, y+piece_radius,
-                                           fill=self.colors[0], outline="#F5F5F5")
+                self.redraw_cell(row, col, (row, col) in winning_positions)
+
+    def redraw_cell(self, row, col, highlight=False):
+        x, y = self.centers[row][col]
+        piece_radius = self.piece_radius
+        # Every item of a cell shares its tag, so a redraw replaces rather than stacks
+        tags = ("cell", f"cell_{row}_{col}")
+        self.canvas.delete(tags[1])
+
+        # Outer ring for depth
+        self.canvas.create_oval(x-piece_radius-2, y-piece_radius-2,
+                              x+piece_radius+2, y+piece_radius+2,
+                              fill="#1A1A3A", outline="#F5F5F5", tags=tags)
+
+        value = self.game.board.get_cell(row, col)
+        if value != Board.EMPTY:
+            color = self.colors[value]
+            if highlight:
+                self.canvas.create_oval(x-piece_radius-4, y-piece_radius-4,
+                                      x+piece_radius+4, y+piece_radius+4,
+                                      fill=self.colors["highlight"],
+                                      outline="", tags=tags)
+            self.canvas.create_oval(x-piece_radius, y-piece_radius,
+                                  x+piece_radius, y+piece_radius,
+                                  fill=color, outline="#F5F5F5", width=2, tags=tags)
+        else:
+            # Empty cell
+            self.canvas.create_oval(x-piece_radius, y-piece_radius,
+                                   x+piece_radius, y+piece_radius,
+                                   fill=self.colors[0], outline="#F5F5F5", tags=tags)
+
+    def draw_last_move(self):
+        # Only the new piece changes, plus the winning line once the game is won
+        self.redraw_cell(*self.game.board.last_move)
+        if self.game.is_game_over():
+            for row, col in self.game.get_winning_positions():
+                self.redraw_cell(row, col, highlight=True)
 
     def on_click(self, event):
         if self.game.is_game_over() or self.game.get_current_player() != Board.HUMAN:
             return
         col = event.x // self.cell_size
         if self.game.make_move(col):
-            self.draw_board()
+            self.draw_last_move()
             if self.game.is_game_over():
                 self.game_over()
             else:
                 self.status.config(text="AI is thinking...")
-                self.after(600, self.ai_move)
+                self.ai_move()
 
     def ai_move(self):
-        self.game.make_ai_move()
-        self.draw_board()
+        # Search on a worker thread so the window stays responsive; the move
+        # is applied back on the Tk thread. The worker gets a snapshot of the
+        # board taken here. A search left over from a reset game still shares
+        # the AI's transposition table, so a new one waits until it reports back.
+        if self.ai_busy:
+            self.ai_queued = True
+            return
+        self.ai_busy = True
+        worker = threading.Thread(target=self.compute_ai_move,
+                                  args=(self.round_id, self.game.ai, self.game.board.clone()),
+                                  daemon=True)
+        worker.start()
+
+    def compute_ai_move(self, round_id, ai, board):
+        try:
+            col = ai.get_move(board)
+        except Exception:
+            traceback.print_exc()
+            col = None
+        self.after(0, lambda: self.apply_ai_move(round_id, col))
+
+    def cancel_ai_move(self):
+        # Called on every reset: a running search's result will be dropped
+        self.round_id += 1
+        self.ai_queued = False
+
+    def apply_ai_move(self, round_id, col):
+        self.ai_busy = False
+        if round_id != self.round_id:
+            # The game was reset while the AI was thinking
+            if self.ai_queued:
+                self.ai_queued = False
+                self.ai_move()
+            return
+        if col is None:
+            self.status.config(text="The AI could not move - start a new game")
+            return
+        if self.game.make_move(col):
+            self.draw_last_move()
         if self.game.is_game_over():
             self.game_over()
         else:
@@ -609,12 +776,13 @@ class GameGUI(tk.Tk):
         self.after(1200, self.new_round)
 
     def new_round(self):
+        self.cancel_ai_move()
         self.game.reset()
         self.draw_board()
         self.status.config(text="Human's turn")
         if self.game.get_current_player() == Board.AI:
             self.status.config(text="AI is thinking...")
-            self.after(600, self.ai_move)
+            self.ai_move()
 
     def update_scores(self):
         scores = self.game.get_scores()
@@ -623,6 +791,7 @@ class GameGUI(tk.Tk):
         self.draws_score.config(text=f"Draws: {scores['draws']}")
 
     def reset_game(self):
+        self.cancel_ai_move()
         self.game.reset()
         self.game.scores = {"human": 0, "ai": 0, "draws": 0}
         self.update_scores()
@@ -630,8 +799,9 @@ class GameGUI(tk.Tk):
         self.status.config(text="Human's turn")
 
     def change_difficulty(self, event):
-        depth_map = {"easy": 2, "medium": 4, "hard": 6}
+        depth_map = {"easy": 2, "medium": 4, "hard": BOOK_DEPTH}
         self.game.set_ai_depth(depth_map[self.difficulty.get().lower()])
+        self.cancel_ai_move()
         self.game.reset()
         self.draw_board()
         self.status.config(text="Human's turn")